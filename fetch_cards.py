@@ -6,15 +6,28 @@ PTCGP 卡牌图片爬虫
 
 import argparse
 import asyncio
+import json
+import math
 import os
+import random
+import socket
 import sys
+import time
 from collections import defaultdict
-from dataclasses import dataclass
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import timezone
+from email.utils import parsedate_to_datetime
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Set, Tuple
+from typing import Any, Callable, Dict, FrozenSet, List, Optional, Set, Tuple
 
-import aiofiles
 import aiohttp
+from tqdm.asyncio import tqdm
+
+try:
+    from orjson import loads as json_loads
+except ImportError:
+    from json import loads as json_loads
 
 # 黑名单：需要从备选源下载的卡牌 (set_code, number)
 BLACKLIST: Set[Tuple[str, int]] = {
@@ -27,16 +40,25 @@ BLACKLIST: Set[Tuple[str, int]] = {
 
 # 备选源配置
 FALLBACK_BASE_URL = "https://raw.githubusercontent.com/marcelpanse/tcg-pocket-collection-tracker/main/frontend/public/images"
-from tenacity import (
-    retry,
-    retry_if_exception_type,
-    stop_after_attempt,
-    wait_exponential,
-)
-from tqdm.asyncio import tqdm
 
 
-@dataclass
+def atomic_write(filepath: Path, data: bytes) -> None:
+    """先写入同目录下的 .tmp 文件再重命名，避免中断时留下不完整的图片"""
+    tmp_path = filepath.with_name(filepath.name + ".tmp")
+    fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+        view = memoryview(data)
+        while view:
+            view = view[os.write(fd, view) :]
+    except BaseException:
+        os.close(fd)
+        tmp_path.unlink(missing_ok=True)
+        raise
+    os.close(fd)
+    os.replace(tmp_path, filepath)
+
+
+@dataclass(slots=True, frozen=True)
 class CardSet:
     """卡牌集合信息"""
 
@@ -47,6 +69,44 @@ class CardSet:
     series: str
 
 
+@dataclass(slots=True, frozen=True)
+class SetTarget:
+    """卡牌集合在某个语言下的下载目标
+
+    URL 前后缀和保存目录每个 (集合, 语言) 只计算一次，逐张卡牌只拼接编号。
+    """
+
+    card_set: CardSet
+    lang: str
+    set_dir: Path
+    # 主源 URL 为 f"{url_prefix}{number}{url_suffix}"
+    url_prefix: str
+    url_suffix: str
+    # 备选源 URL 为 f"{fallback_prefix}{number}.webp"
+    fallback_prefix: str
+    # 该集合在黑名单中的卡牌编号
+    blacklist: FrozenSet[int]
+    # 开始下载前目录中已有的文件名（一次 scandir 得到）
+    existing: FrozenSet[str]
+    # 在清单中有大小记录的已有 PNG 的实际字节数 {number: size}，只对这些文件 stat；
+    # 不参与比较和哈希
+    png_sizes: Dict[int, int] = field(compare=False)
+
+    @property
+    def probe_mode(self) -> bool:
+        """API 返回卡牌数量为 0 的集合使用探测模式"""
+        return self.card_set.set_n_cards + self.card_set.set_n_secrets == 0
+
+    def image_url(self, number: int) -> str:
+        return f"{self.url_prefix}{number}{self.url_suffix}"
+
+    def fallback_url(self, number: int) -> str:
+        return f"{self.fallback_prefix}{number}.webp"
+
+    def image_path(self, number: int, ext: str = "png") -> Path:
+        return self.set_dir / f"{number}.{ext}"
+
+
 class PTCGPDownloader:
     """PTCGP 卡牌图片下载器"""
 
@@ -54,6 +114,37 @@ class PTCGPDownloader:
     IMAGE_BASE_URL = "https://s3.pokeos.com/pokeos-uploads/tcg/pocket"
     FALLBACK_BASE_URL = "https://raw.githubusercontent.com/marcelpanse/tcg-pocket-collection-tracker/main/frontend/public/images"
 
+    # 语言代码映射（本地目录名 -> 主源 URL 中的语言代码）
+    LANG_MAP = {
+        "zh-TW": "zh",
+        "en-US": "en",
+    }
+
+    # 会话默认请求头之外，API 请求只需覆盖 Accept
+    API_HEADERS = {"Accept": "application/json"}
+
+    # 请求超时配置，不可变对象，只创建一次
+    API_TIMEOUT = aiohttp.ClientTimeout(total=30)
+    PROBE_TIMEOUT = aiohttp.ClientTimeout(total=30)
+    DOWNLOAD_TIMEOUT = aiohttp.ClientTimeout(total=60)
+
+    # 重试退避的最长等待时间（秒），429 的 Retry-After 超过该值时放弃重试
+    MAX_RETRY_DELAY = 32
+
+    # 读取未知大小响应时的分块大小
+    CHUNK_SIZE = 64 * 1024
+    # 大文件流式写入的分块大小
+    STREAM_CHUNK_SIZE = 256 * 1024
+    # 小于该大小的响应一次性读入内存后整体写入
+    BUFFERED_WRITE_LIMIT = 2 * 1024 * 1024
+    # 主源 404 缓存有效期（秒），过期后重新请求
+    MISSING_CACHE_TTL = 7 * 86400
+    # 磁盘写入线程数，SSD 超过 4~8 个并发写入后吞吐基本不再提升
+    IO_WORKERS = 8
+    # 进度条批量刷新：累计数量或时间间隔（秒）任一达到即刷新
+    PBAR_FLUSH_COUNT = 100
+    PBAR_FLUSH_INTERVAL = 0.1
+
     def __init__(
         self,
         base_dir: Path,
@@ -61,49 +152,147 @@ class PTCGPDownloader:
         series_list: List[str],
         max_concurrency: int = 20,
         max_retries: int = 3,
+        session: Optional[aiohttp.ClientSession] = None,
+        refresh: bool = False,
+        per_host_limit: Optional[int] = None,
     ):
         self.base_dir = base_dir
         self.languages = languages
         self.series_list = series_list
         self.max_concurrency = max_concurrency
         self.max_retries = max_retries
+        # 单个主机的连接数上限，默认与并发数一致；0 表示不限制
+        self.per_host_limit = (
+            max_concurrency if per_host_limit is None else per_host_limit
+        )
+        # 是否重新检查已存在的主源图片（条件请求，未变化时服务端返回 304）
+        self.refresh = refresh
+
+        # HTTP 会话，可由调用方注入以跨多次运行复用
+        self.session = session
+        self._owns_session = False
 
-        # 并发控制
-        self.semaphore = asyncio.Semaphore(max_concurrency)
+        # 磁盘写入专用线程池，由 run() 在每次运行期间创建并关闭，不占用默认执行器；
+        # 为 None 时（在 run() 之外直接调用下载方法）退回默认执行器
+        self._io_pool: Optional[ThreadPoolExecutor] = None
+
+        self.reset_stats()
+
+        # 主源 404 缓存，跨运行持久化，格式: {"set_code/number/lang": 记录时间戳}
+        self.missing_cache_path = base_dir / ".cache" / "missing.json"
+        self.missing_cache: Dict[str, float] = {}
+
+        # 已下载主源图片的清单，键同上，格式: {"etag": ETag, "size": 文件字节数}
+        # size 用于发现不完整或损坏的本地文件，etag 用于 --refresh 时发送条件请求
+        self.manifest_path = base_dir / ".cache" / "manifest.json"
+        self.manifest: Dict[str, Dict[str, Any]] = {}
+
+    def reset_stats(self):
+        """重置单次运行的统计和报告，同一实例多次 run() 时互不累计"""
+        # 尚未刷新到进度条的完成数
+        self._pbar_pending = 0
 
         # 统计
-        self.stats = {
-            "downloaded": 0,
-            "skipped": 0,
-            "failed": 0,
-            "total": 0,
-        }
+        self.downloaded = 0
+        self.downloaded_fallback = 0
+        self.skipped = 0
+        self.failed = 0
+        self.total = 0
+
+        # 失败的 URL，按 set_code 分组: {set_code: [url]}
+        self.failed_items: Dict[str, List[str]] = defaultdict(list)
+
+        # 缺失的 URL（404），按 set_code 分组: {set_code: [url]}
+        self.missing_items: Dict[str, List[str]] = defaultdict(list)
+
+        # 从备选源下载的 URL，按 set_code 分组: {set_code: [(number, lang, url)]}
+        self.fallback_items: Dict[str, List[tuple]] = defaultdict(list)
+
+    def tick(self, pbar: tqdm, n: int = 1):
+        """累计进度，攒够 PBAR_FLUSH_COUNT 再刷新，减少 tqdm 的加锁和重绘"""
+        self._pbar_pending += n
+        if self._pbar_pending >= self.PBAR_FLUSH_COUNT:
+            self.flush_pbar(pbar)
+
+    def flush_pbar(self, pbar: tqdm):
+        """将累计的进度一次性刷新到进度条"""
+        if self._pbar_pending:
+            pbar.update(self._pbar_pending)
+            self._pbar_pending = 0
+
+    async def flush_pbar_periodically(self, pbar: tqdm):
+        """定时刷新进度条，避免完成数较少时进度长时间不动"""
+        while True:
+            await asyncio.sleep(self.PBAR_FLUSH_INTERVAL)
+            self.flush_pbar(pbar)
+
+    @staticmethod
+    def card_key(set_code: str, number: int, lang: str) -> str:
+        """卡牌在主源 404 缓存和下载清单中的键"""
+        return f"{set_code}/{number}/{lang}"
+
+    @staticmethod
+    def read_cache_file(path: Path) -> Dict[str, Any]:
+        """读取 JSON 缓存文件，不存在、损坏或顶层不是对象时返回空字典"""
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            print(f"[警告] 无法读取缓存 {path}: {e}")
+            return {}
+        if not isinstance(data, dict):
+            print(f"[警告] 无法读取缓存 {path}: 内容不是 JSON 对象")
+            return {}
+        return data
+
+    @staticmethod
+    def write_cache_file(path: Path, data: Dict[str, Any]):
+        """写回 JSON 缓存文件"""
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(data, f, indent=2, sort_keys=True)
+        except OSError as e:
+            print(f"[警告] 无法写入缓存 {path}: {e}")
 
-        # 失败的 URL 列表，格式: (set_code, url)
-        self.failed_items: List[tuple] = []
+    def load_caches(self):
+        """从磁盘加载主源 404 缓存（丢弃已过期的记录）和已下载图片清单
 
-        # 缺失的 URL 列表（404），格式: (set_code, url)
-        self.missing_items: List[tuple] = []
+        格式不对的记录直接丢弃：404 缓存的值须为时间戳数字，清单的值须为对象。
+        """
+        expire_before = time.time() - self.MISSING_CACHE_TTL
+        self.missing_cache = {
+            key: ts
+            for key, ts in self.read_cache_file(self.missing_cache_path).items()
+            if isinstance(ts, (int, float)) and ts >= expire_before
+        }
+        self.manifest = {
+            key: record
+            for key, record in self.read_cache_file(self.manifest_path).items()
+            if isinstance(record, dict)
+        }
 
-        # 从备选源下载的 URL 列表
-        self.fallback_items: List[tuple] = []
+    def save_caches(self):
+        """将主源 404 缓存和已下载图片清单写回磁盘"""
+        self.write_cache_file(self.missing_cache_path, self.missing_cache)
+        self.write_cache_file(self.manifest_path, self.manifest)
 
     async def fetch_sets(
         self, session: aiohttp.ClientSession, series: str
     ) -> List[CardSet]:
         """获取指定系列的卡牌集合列表"""
         url = f"{self.BASE_API_URL}?lang=pocket&group={series}"
-        headers = {
-            "Origin": "https://www.pokeos.com/",
-            "Accept": "application/json",
-        }
+        # PROMO 集合的 set_code 按系列区分，每个系列只需构造一次
+        promo_code = f"PROMO-{series.upper()}"
 
         try:
             async with session.get(
-                url, headers=headers, timeout=aiohttp.ClientTimeout(total=30)
+                url, headers=self.API_HEADERS, timeout=self.API_TIMEOUT
             ) as response:
                 response.raise_for_status()
-                data = await response.json()
+                data = json_loads(await response.read())
 
                 sets = []
                 for item in data:
@@ -111,10 +300,9 @@ class PTCGPDownloader:
                     if item.get("main_set") is not None:
                         continue
 
-                    # 处理 PROMO 集合的 set_code，按系列区分
                     set_code = item["set_code"]
                     if set_code == "PROMO":
-                        set_code = f"PROMO-{series.upper()}"
+                        set_code = promo_code
 
                     sets.append(
                         CardSet(
@@ -131,147 +319,249 @@ class PTCGPDownloader:
             print(f"[错误] 获取系列 {series} 失败: {e}")
             return []
 
-    def get_image_path(
-        self, lang: str, set_code: str, number: int, ext: str = "png"
-    ) -> Path:
-        """获取图片保存路径"""
-        return (
-            self.base_dir
-            / "images"
-            / lang
-            / "cards-by-set"
-            / set_code
-            / f"{number}.{ext}"
-        )
+    def get_set_dir(self, lang: str, set_code: str) -> Path:
+        """获取卡牌集合的图片目录"""
+        return self.base_dir / "images" / lang / "cards-by-set" / set_code
 
-    def get_image_url(self, set_id: str, number: int, lang: str) -> str:
-        """获取图片 URL"""
-        # 处理语言代码映射
-        lang_map = {
-            "zh-TW": "zh",
-            "en-US": "en",
-        }
-        lang_code = lang_map.get(lang, lang)
-        return f"{self.IMAGE_BASE_URL}/{set_id}/src/{number}_{lang_code}.png"
-
-    def get_fallback_url(self, set_code: str, number: int) -> str:
-        """获取备选源图片 URL（英文 webp）"""
+    def get_fallback_prefix(self, set_code: str) -> str:
+        """获取备选源图片 URL 前缀（英文 webp），拼接 "{number}.webp" 即为完整 URL"""
         # 备用源中 PROMO- 开头的都改为 P- 格式
         if set_code.upper().startswith("PROMO-"):
             set_code = "P-" + set_code[6:]
-        return f"{self.FALLBACK_BASE_URL}/en-US/{set_code}-{number}.webp"
+        return f"{self.FALLBACK_BASE_URL}/en-US/{set_code}-"
+
+    async def make_target(self, card_set: CardSet, lang: str) -> SetTarget:
+        """预先计算 (集合, 语言) 的 URL 前后缀和保存目录，并在线程中扫描已有文件"""
+        set_dir = self.get_set_dir(lang, card_set.set_code)
+        existing, png_sizes = await asyncio.to_thread(
+            self.scan_set_dir, set_dir, card_set.set_code, lang
+        )
+        return SetTarget(
+            card_set=card_set,
+            lang=lang,
+            set_dir=set_dir,
+            url_prefix=f"{self.IMAGE_BASE_URL}/{card_set.id}/src/",
+            url_suffix=f"_{self.LANG_MAP.get(lang, lang)}.png",
+            fallback_prefix=self.get_fallback_prefix(card_set.set_code),
+            blacklist=frozenset(
+                number
+                for set_code, number in BLACKLIST
+                if set_code == card_set.set_code
+            ),
+            existing=existing,
+            png_sizes=png_sizes,
+        )
+
+    async def save_response(
+        self, response: aiohttp.ClientResponse, filepath: Path
+    ) -> int:
+        """将响应内容写入文件，返回写入的字节数
+
+        卡牌图片通常只有几十到几百 KiB：不超过 BUFFERED_WRITE_LIMIT 的响应（包括
+        未提供 Content-Length、实际大小在上限内的响应）完整读入内存后，在写入线程池中
+        一次写入；超过上限时在写入线程池中按 STREAM_CHUNK_SIZE 流式写入。
+        """
+        content_length = response.content_length
+        head = b""
+        if content_length is None:
+            # 未知大小：先缓冲到上限，读完则整体写入，否则转为流式写入
+            buffer = bytearray()
+            async for chunk in response.content.iter_chunked(self.CHUNK_SIZE):
+                buffer += chunk
+                if len(buffer) > self.BUFFERED_WRITE_LIMIT:
+                    head = bytes(buffer)
+                    break
+            else:
+                await self.write_file(filepath, bytes(buffer))
+                return len(buffer)
+        elif content_length <= self.BUFFERED_WRITE_LIMIT:
+            data = await response.read()
+            await self.write_file(filepath, data)
+            return len(data)
+
+        # 大文件：在写入线程池中流式写入 .tmp 文件，完成后重命名
+        loop = asyncio.get_running_loop()
+        tmp_path = filepath.with_name(filepath.name + ".tmp")
+        f = await loop.run_in_executor(self._io_pool, open, tmp_path, "wb")
+        size = len(head)
+        try:
+            if head:
+                await loop.run_in_executor(self._io_pool, f.write, head)
+            async for chunk in response.content.iter_chunked(self.STREAM_CHUNK_SIZE):
+                await loop.run_in_executor(self._io_pool, f.write, chunk)
+                size += len(chunk)
+        except BaseException:
+            await loop.run_in_executor(self._io_pool, f.close)
+            tmp_path.unlink(missing_ok=True)
+            raise
+        await loop.run_in_executor(self._io_pool, f.close)
+        os.replace(tmp_path, filepath)
+        return size
+
+    async def write_file(self, filepath: Path, data: bytes) -> None:
+        """在写入线程池中原子写入整个文件，每个文件只需一次线程切换"""
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self._io_pool, atomic_write, filepath, data)
 
-    @retry(
-        stop=stop_after_attempt(3),
-        wait=wait_exponential(multiplier=1, min=1, max=10),
-        retry=retry_if_exception_type((aiohttp.ClientError, asyncio.TimeoutError)),
-        reraise=True,
-    )
     async def download_image(
         self,
         session: aiohttp.ClientSession,
         url: str,
         filepath: Path,
         pbar: tqdm,
-    ) -> tuple[bool, bool]:
-        """下载单张图片
+        manifest_key: Optional[str] = None,
+        conditional: bool = False,
+    ) -> int:
+        """下载单张图片，网络错误时重试，最多尝试 max_retries 次
+
+        重试间隔为带随机抖动的指数退避；429 响应带 Retry-After 时按其等待，
+        要求等待超过 MAX_RETRY_DELAY 时不再重试，避免长时间占用 worker。
 
         Returns:
-            (success, is_404):
-            - success: 是否成功下载
-            - is_404: 是否是404错误
+            HTTP 状态码，见 download_image_once
         """
+        attempts = max(self.max_retries, 1)
+        for attempt in range(attempts):
+            try:
+                return await self.download_image_once(
+                    session, url, filepath, manifest_key, conditional
+                )
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                if attempt + 1 >= attempts:
+                    raise
+                delay = None
+                if isinstance(e, aiohttp.ClientResponseError) and e.status == 429:
+                    delay = self.parse_retry_after(e.headers)
+                    if delay is not None and delay > self.MAX_RETRY_DELAY:
+                        raise
+                if delay is None:
+                    delay = min(2**attempt + random.random(), self.MAX_RETRY_DELAY)
+                await asyncio.sleep(delay)
+
+    @staticmethod
+    def parse_retry_after(headers: Optional[Any]) -> Optional[float]:
+        """解析 Retry-After 响应头（秒数或 HTTP 日期），无法解析时返回 None"""
+        value = headers.get("Retry-After") if headers else None
+        if not value:
+            return None
         try:
-            async with session.get(
-                url, timeout=aiohttp.ClientTimeout(total=60)
-            ) as response:
-                if response.status == 404:
-                    # 图片不存在
-                    return False, True
+            seconds = float(value)
+        except ValueError:
+            try:
+                retry_at = parsedate_to_datetime(value)
+            except (TypeError, ValueError):
+                return None
+            if retry_at.tzinfo is None:
+                # "-0000" 时区的日期解析为 naive datetime，按 UTC 处理
+                retry_at = retry_at.replace(tzinfo=timezone.utc)
+            seconds = retry_at.timestamp() - time.time()
+        # nan/inf 无法用于 sleep，退回带抖动的指数退避
+        if not math.isfinite(seconds):
+            return None
+        return max(seconds, 0.0)
+
+    async def download_image_once(
+        self,
+        session: aiohttp.ClientSession,
+        url: str,
+        filepath: Path,
+        manifest_key: Optional[str] = None,
+        conditional: bool = False,
+    ) -> int:
+        """下载单张图片（单次请求，不重试）
 
-                response.raise_for_status()
+        成功下载后按 manifest_key 在清单中记录 ETag 和文件大小；conditional 为真
+        （--refresh 且本地文件存在）且 ETag 已知时发送 If-None-Match，
+        未变化的图片服务端只返回 304 响应头。
 
-                # 确保目录存在
-                filepath.parent.mkdir(parents=True, exist_ok=True)
+        Returns:
+            HTTP 状态码：200 已下载，304 未变化（未传输内容），404 图片不存在
+        """
+        headers = None
+        if conditional and manifest_key in self.manifest:
+            etag = self.manifest[manifest_key].get("etag")
+            if etag:
+                headers = {"If-None-Match": etag}
+
+        async with session.get(
+            url, headers=headers, timeout=self.DOWNLOAD_TIMEOUT
+        ) as response:
+            if response.status in (304, 404):
+                # 未变化或图片不存在
+                return response.status
+
+            if response.status >= 400:
+                # 只在失败时构造异常，交给 download_image 判断是否重试
+                raise aiohttp.ClientResponseError(
+                    response.request_info,
+                    response.history,
+                    status=response.status,
+                    message=response.reason or "",
+                    headers=response.headers,
+                )
 
-                # 流式写入文件
-                async with aiofiles.open(filepath, "wb") as f:
-                    async for chunk in response.content.iter_chunked(8192):
-                        await f.write(chunk)
+            size = await self.save_response(response, filepath)
 
-                return True, False
-        except Exception:
-            # 失败直接抛出，由 tenacity 控制重试
-            raise
+            if manifest_key is not None:
+                record: Dict[str, Any] = {"size": size}
+                new_etag = response.headers.get("ETag")
+                if new_etag:
+                    record["etag"] = new_etag
+                self.manifest[manifest_key] = record
+            return 200
 
     async def download_from_fallback(
         self,
         session: aiohttp.ClientSession,
-        set_code: str,
+        target: SetTarget,
         number: int,
-        lang: str,
         pbar: tqdm,
     ) -> bool:
         """从备选源下载图片（英文 webp）"""
+        set_code = target.card_set.set_code
         # 构建备选源 URL（英文）
-        url = self.get_fallback_url(set_code, number)
+        url = target.fallback_url(number)
         # 保存为 .webp 格式
-        filepath = self.get_image_path(lang, set_code, number, ext="webp")
+        filepath = target.image_path(number, ext="webp")
 
         try:
-            async with self.semaphore:
-                async with session.get(
-                    url, timeout=aiohttp.ClientTimeout(total=60)
-                ) as response:
-                    if response.status == 404:
-                        return False
+            async with session.get(url, timeout=self.DOWNLOAD_TIMEOUT) as response:
+                if response.status >= 400:
+                    # 备选源不重试，404 和其他错误都视为失败
+                    return False
 
-                    response.raise_for_status()
+                await self.save_response(response, filepath)
 
-                    # 确保目录存在
-                    filepath.parent.mkdir(parents=True, exist_ok=True)
-
-                    # 流式写入文件
-                    async with aiofiles.open(filepath, "wb") as f:
-                        async for chunk in response.content.iter_chunked(8192):
-                            await f.write(chunk)
-
-                    self.stats["downloaded_fallback"] = (
-                        self.stats.get("downloaded_fallback", 0) + 1
-                    )
-                    self.fallback_items.append((set_code, number, lang, url))
-                    return True
+                self.downloaded_fallback += 1
+                self.fallback_items[set_code].append((number, target.lang, url))
+                return True
         except Exception:
             return False
         finally:
-            pbar.update(1)
+            self.tick(pbar)
 
     async def process_card(
         self,
         session: aiohttp.ClientSession,
-        card_set: CardSet,
+        target: SetTarget,
         number: int,
-        lang: str,
         pbar: tqdm,
-        is_probe_mode: bool = False,
-    ) -> tuple[bool, bool]:
-        """处理单张卡牌下载
+    ) -> bool:
+        """处理单张卡牌下载，由 worker 调用，并发数由 worker 数量限制
 
-        Args:
-            is_probe_mode: 是否为探测模式（探测模式的 404 是正常的，不记录为缺失）
+        探测模式的编号已由 probe_cards 确认存在，这里与批量模式统一处理；
+        主源 404 缓存只用于批量模式，探测模式以本次 HEAD 结果为准。
 
         Returns:
-            (success, is_404):
-            - success: 是否成功下载
-            - is_404: 是否是404错误
+            是否成功获取（下载、未变化或从备选源下载）
         """
-        # 检查是否在黑名单中
-        is_blacklisted = (card_set.set_code, number) in BLACKLIST
+        card_set = target.card_set
 
-        if is_blacklisted:
+        # 检查是否在黑名单中
+        if number in target.blacklist:
             # 黑名单卡牌：先删除可能存在的旧 PNG 文件，然后从备选源下载 webp
-            png_path = self.get_image_path(lang, card_set.set_code, number, ext="png")
-            if png_path.exists():
+            if f"{number}.png" in target.existing:
+                png_path = target.image_path(number)
                 try:
                     png_path.unlink()
                     print(f"  [黑名单] 删除旧文件: {png_path}")
@@ -279,251 +569,465 @@ class PTCGPDownloader:
                     print(f"  [警告] 无法删除旧文件 {png_path}: {e}")
 
             # 从备选源下载（英文 webp）
-            success = await self.download_from_fallback(
-                session, card_set.set_code, number, lang, pbar
-            )
+            success = await self.download_from_fallback(session, target, number, pbar)
             if not success:
-                self.stats["failed"] = self.stats.get("failed", 0) + 1
-                self.failed_items.append(
-                    (card_set.set_code, f"fallback:{card_set.set_code}-{number}")
+                self.failed += 1
+                self.failed_items[card_set.set_code].append(
+                    f"fallback:{card_set.set_code}-{number}"
                 )
-            return success, False
+            return success
 
-        # 正常流程：先尝试主源
-        filepath = self.get_image_path(lang, card_set.set_code, number)
+        # 正常流程：先尝试主源（已存在的文件在入队前已过滤）
+        filepath = target.image_path(number)
+        url = target.image_url(number)
+        key = self.card_key(card_set.set_code, number, target.lang)
 
-        # 检查文件是否已存在
-        if filepath.exists():
-            self.stats["skipped"] += 1
-            pbar.update(1)
-            return True, False
+        use_cache = not target.probe_mode
 
-        url = self.get_image_url(card_set.id, number, lang)
+        try:
+            if use_cache and key in self.missing_cache:
+                # 近期已确认主源 404，不再请求主源
+                status = 404
+            else:
+                status = await self.download_image(
+                    session,
+                    url,
+                    filepath,
+                    pbar,
+                    manifest_key=key,
+                    conditional=f"{number}.png" in target.existing,
+                )
+                if status == 404 and use_cache:
+                    self.missing_cache[key] = time.time()
+            if status == 200:
+                # 主源下载成功，删除之前从备选源下载的 webp
+                if f"{number}.webp" in target.existing:
+                    target.image_path(number, ext="webp").unlink(missing_ok=True)
+                self.downloaded += 1
+                self.tick(pbar)
+                return True
+            elif status == 304:
+                # 已存在且未变化
+                self.skipped += 1
+                self.tick(pbar)
+                return True
+            elif status == 404:
+                # 主源 404：尝试备选源兜底
+                fallback_success = await self.download_from_fallback(
+                    session, target, number, pbar
+                )
+                if not fallback_success:
+                    # 备选源也失败，记录为缺失
+                    self.missing_items[card_set.set_code].append(url)
+                return fallback_success
+            else:
+                # 其他失败
+                self.failed += 1
+                self.failed_items[card_set.set_code].append(url)
+                self.tick(pbar)
+                return False
+        except Exception:
+            self.failed += 1
+            self.failed_items[card_set.set_code].append(url)
+            self.tick(pbar)
+            return False
 
-        async with self.semaphore:
+    async def head_status(self, session: aiohttp.ClientSession, url: str) -> int:
+        """HEAD 请求探测图片是否存在，只取响应头；请求异常时返回 0"""
+        try:
+            async with session.head(url, timeout=self.PROBE_TIMEOUT) as response:
+                return response.status
+        except Exception:
+            return 0
+
+    @staticmethod
+    def list_existing(set_dir: Path) -> FrozenSet[str]:
+        """一次 scandir 列出目录中已有的文件名，目录不存在时返回空集合"""
+        try:
+            with os.scandir(set_dir) as entries:
+                return frozenset(entry.name for entry in entries)
+        except FileNotFoundError:
+            return frozenset()
+
+    def scan_set_dir(
+        self, set_dir: Path, set_code: str, lang: str
+    ) -> Tuple[FrozenSet[str], Dict[int, int]]:
+        """列出目录中已有的文件名，并获取清单中有大小记录的 PNG 的实际字节数
+
+        在 make_target 的工作线程中执行。scandir 只提供文件名，获取大小需要单独
+        stat，因此只对 is_intact 会比较的 {number}.png 发起，不扫描其他文件。
+        """
+        existing = self.list_existing(set_dir)
+        png_sizes: Dict[int, int] = {}
+        for name in existing:
+            stem, _, ext = name.partition(".")
+            if ext != "png" or not stem.isdigit():
+                continue
+            number = int(stem)
+            record = self.manifest.get(self.card_key(set_code, number, lang))
+            if record is None or "size" not in record:
+                continue
             try:
-                success, is_404 = await self.download_image(
-                    session, url, filepath, pbar
-                )
-                if success:
-                    # 主源下载成功
-                    self.stats["downloaded"] += 1
-                    pbar.update(1)
-                    return True, False
-                elif is_404:
-                    # 主源 404
-                    if is_probe_mode:
-                        # 探测模式：404 是正常的探测结果，不尝试备用源，不记录缺失
-                        pbar.update(1)
-                        return False, True
-                    else:
-                        # 批量模式：尝试备选源兜底
-                        fallback_success = await self.download_from_fallback(
-                            session, card_set.set_code, number, lang, pbar
-                        )
-                        if not fallback_success:
-                            # 备选源也失败，记录为缺失
-                            self.missing_items.append((card_set.set_code, url))
-                        return fallback_success, False
-                else:
-                    # 其他失败
-                    self.stats["failed"] += 1
-                    self.failed_items.append((card_set.set_code, url))
-                    pbar.update(1)
-                    return False, False
-            except Exception:
-                self.stats["failed"] += 1
-                self.failed_items.append((card_set.set_code, url))
-                pbar.update(1)
-                return False, False
+                png_sizes[number] = os.stat(set_dir / name).st_size
+            except OSError:
+                # 扫描期间被删除的文件，视为大小不一致
+                continue
+        return existing, png_sizes
 
     async def probe_cards(
         self,
         session: aiohttp.ClientSession,
-        card_set: CardSet,
-        lang: str,
-        pbar: tqdm,
+        target: SetTarget,
         max_number: int = 200,
-    ):
-        """探测模式：从1开始递增获取，遇到404停止或达到上限"""
-        consecutive_404 = 0
+    ) -> List[int]:
+        """探测模式：滑动窗口并发 HEAD 探测 1..max_number，返回需要下载的编号
+
+        始终保持 max_concurrency 个探测在途，任一完成即补发下一个编号，不必等待整批；
+        按编号顺序检查已返回的结果，从 1 开始连续遇到 3 个 404 即视为到达末尾，
+        停止补发并取消之后仍在途的探测。
+        """
         max_consecutive_404 = 3  # 连续3个404停止
 
-        for number in range(1, max_number + 1):
-            success, is_404 = await self.process_card(
-                session, card_set, number, lang, pbar, is_probe_mode=True
-            )
+        async def probe(number: int) -> int:
+            if number in target.blacklist:
+                # 黑名单编号主源缺失，不探测主源，交给 process_card 从备选源下载；
+                # 视为存在，以免主源的连续空缺提前结束探测
+                return 200
+            if f"{number}.png" in target.existing:
+                return 200
+            # 不使用主源 404 缓存：末尾之后的编号随时可能新增，每次都重新探测
+            return await self.head_status(session, target.image_url(number))
+
+        numbers: List[int] = []
+        statuses: Dict[int, int] = {}
+        in_flight: Dict[asyncio.Task, int] = {}
+        next_number = 1  # 下一个待发起探测的编号
+        scan = 1  # 下一个待按顺序检查结果的编号
+        consecutive_404 = 0
+        done = False
+
+        try:
+            while True:
+                while (
+                    not done
+                    and next_number <= max_number
+                    and len(in_flight) < self.max_concurrency
+                ):
+                    in_flight[asyncio.create_task(probe(next_number))] = next_number
+                    next_number += 1
+
+                if not in_flight:
+                    break
+
+                finished, _ = await asyncio.wait(
+                    in_flight, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in finished:
+                    statuses[in_flight.pop(task)] = task.result()
+
+                # 按编号顺序推进，只有前面的结果都返回后才能判断是否到达末尾
+                while not done and scan in statuses:
+                    if statuses.pop(scan) == 404:
+                        consecutive_404 += 1
+                        if consecutive_404 >= max_consecutive_404:
+                            # 连续404达到阈值，停止探测
+                            done = True
+                    else:
+                        # 重置404计数；请求异常的编号也交给正常下载流程处理
+                        consecutive_404 = 0
+                        numbers.append(scan)
+                    scan += 1
 
-            if is_404:
-                consecutive_404 += 1
-                if consecutive_404 >= max_consecutive_404:
-                    # 连续404达到阈值，停止探测
+                if done:
                     break
-            else:
-                # 重置404计数
-                consecutive_404 = 0
+        finally:
+            # 到达末尾后剩余的探测都在末尾之后，结果不再需要
+            for task in in_flight:
+                task.cancel()
 
-            if number >= max_number:
-                # 达到上限
-                break
+        return numbers
 
-    async def process_set(
+    async def produce(
         self,
         session: aiohttp.ClientSession,
-        card_set: CardSet,
+        queue: asyncio.Queue,
+        all_sets: List[CardSet],
         pbar: tqdm,
     ):
-        """处理单个卡牌集合"""
-        total_cards = card_set.set_n_cards + card_set.set_n_secrets
-
-        if total_cards == 0:
-            # 使用探测模式
-            tasks = []
-            for lang in self.languages:
-                task = self.probe_cards(session, card_set, lang, pbar)
-                tasks.append(task)
-
-            if tasks:
-                await asyncio.gather(*tasks, return_exceptions=True)
-        else:
-            # 使用批量模式
-            tasks = []
-            for lang in self.languages:
-                for number in range(1, total_cards + 1):
-                    task = self.process_card(session, card_set, number, lang, pbar)
-                    tasks.append(task)
-
-            if tasks:
-                await asyncio.gather(*tasks, return_exceptions=True)
+        """将所有集合、所有语言的下载任务 (target, number) 放入同一个队列
 
-    async def run(self):
-        """运行下载器"""
-        print(f"开始下载 PTCGP 卡牌图片...")
-        print(f"目标目录: {self.base_dir}")
-        print(f"语言: {', '.join(self.languages)}")
-        print(f"系列: {', '.join(self.series_list)}")
-        print(f"并发数: {self.max_concurrency}")
-        print()
+        所有卡牌共享同一组 worker，集合之间没有等待屏障。探测模式的集合在开始时
+        就并发发起 HEAD 探测，并排在批量模式之后入队，探测与下载重叠进行。
+        每个 (lang, set_code) 目录只在 make_target 中 scandir 一次（在线程中并发扫描，
+        只对清单中有大小记录的 PNG 额外 stat），已存在且完整的图片直接计为跳过；
+        目录在入队前统一创建，下载时不再逐个文件 mkdir。
+        """
+        async with asyncio.TaskGroup() as tg:
+            scans = [
+                tg.create_task(self.make_target(card_set, lang))
+                for card_set in all_sets
+                for lang in self.languages
+            ]
+        targets = [scan.result() for scan in scans]
+        # 探测任务放在 TaskGroup 中，入队出错时一并取消
+        async with asyncio.TaskGroup() as tg:
+            probes = {
+                target: tg.create_task(self.probe_cards(session, target))
+                for target in targets
+                if target.probe_mode
+            }
+
+            for target in sorted(targets, key=lambda t: t in probes):
+                card_set = target.card_set
+                if target in probes:
+                    # 使用探测模式，只下载探测到存在的编号，并将其计入进度条总数
+                    numbers = await probes[target]
+                    self.total += len(numbers)
+                    pbar.total += len(numbers)
+                else:
+                    # 使用批量模式
+                    numbers = range(
+                        1, card_set.set_n_cards + card_set.set_n_secrets + 1
+                    )
+
+                pending = []
+                skipped = 0
+                for number in numbers:
+                    if self.can_skip(target, number):
+                        skipped += 1
+                    else:
+                        pending.append(number)
+
+                if skipped:
+                    self.skipped += skipped
+                    self.tick(pbar, skipped)
+
+                if not pending:
+                    continue
 
-        # 创建 aiohttp 会话，启用连接池和 HTTP/2
+                target.set_dir.mkdir(parents=True, exist_ok=True)
+                for number in pending:
+                    await queue.put((target, number))
+
+    def can_skip(self, target: SetTarget, number: int) -> bool:
+        """已存在的图片是否可以直接跳过
+
+        黑名单卡牌每次都需要清理旧 PNG 并从备选源重新下载。备选源的 webp 只在
+        主源 404 缓存有效期内跳过，过期后重新检查主源；探测模式不使用该缓存，
+        其编号已由本次 HEAD 确认主源存在。PNG 完整且未指定 --refresh 时跳过。
+        """
+        if number in target.blacklist:
+            return False
+        files = target.existing
+        if f"{number}.png" in files:
+            # --refresh 时已存在的 PNG 也重新请求（带 ETag 的条件请求）
+            return self.is_intact(target, number) and not self.refresh
+        if f"{number}.webp" in files and not target.probe_mode:
+            key = self.card_key(target.card_set.set_code, number, target.lang)
+            return key in self.missing_cache
+        return False
+
+    def is_intact(self, target: SetTarget, number: int) -> bool:
+        """已存在的 PNG 是否完整：大小与清单记录一致，或清单中没有记录
+
+        大小不一致（下载中断或文件损坏）时删除清单记录，之后不再发送条件请求、
+        而是重新完整下载。
+        """
+        key = self.card_key(target.card_set.set_code, number, target.lang)
+        record = self.manifest.get(key)
+        if record is None or "size" not in record:
+            return True
+        # 文件大小已在 make_target 的工作线程中获取，这里不再 stat
+        if target.png_sizes.get(number) == record["size"]:
+            return True
+        del self.manifest[key]
+        return False
+
+    async def worker(
+        self,
+        session: aiohttp.ClientSession,
+        queue: asyncio.Queue,
+        pbar: tqdm,
+    ):
+        """从队列取任务执行，收到 None 哨兵后退出"""
+        while True:
+            item = await queue.get()
+            if item is None:
+                return
+
+            target, number = item
+            try:
+                await self.process_card(session, target, number, pbar)
+            except Exception as e:
+                print(
+                    f"[错误] 处理 {target.card_set.set_code} #{number} "
+                    f"[{target.lang}] 失败: {e}"
+                )
+
+    def create_session(self) -> aiohttp.ClientSession:
+        """创建 aiohttp 会话，启用连接池复用
+
+        aiohttp 只支持 HTTP/1.1，无法多路复用；通过较长的 keep-alive
+        让空闲连接留在池中，尽量复用已建立的 TCP/TLS 连接，减少握手。
+        """
         connector = aiohttp.TCPConnector(
-            limit=100,
-            limit_per_host=30,
+            # 主源只有一个域名，单主机上限才是实际的并发瓶颈，随并发数调整
+            limit=max(200, 2 * self.max_concurrency),
+            limit_per_host=self.per_host_limit,
+            keepalive_timeout=60,
+            # 使用 aiodns 异步解析并缓存 DNS 结果，只走 IPv4 避免双栈连接尝试
+            resolver=aiohttp.AsyncResolver(),
+            use_dns_cache=True,
+            ttl_dns_cache=600,
+            family=socket.AF_INET,
             enable_cleanup_closed=True,
             force_close=False,
         )
 
         timeout = aiohttp.ClientTimeout(total=None, connect=30, sock_read=60)
+        # 所有请求共用的默认请求头，单个请求只传需要覆盖的部分
         headers = {
             "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36",
             "Accept": "image/webp,image/apng,image/*,*/*;q=0.8",
+            "Origin": "https://www.pokeos.com/",
         }
 
-        async with aiohttp.ClientSession(
+        return aiohttp.ClientSession(
             connector=connector,
             timeout=timeout,
             headers=headers,
-        ) as session:
-            # 获取所有系列的集合
-            all_sets: List[CardSet] = []
-            for series in self.series_list:
-                sets = await self.fetch_sets(session, series)
-                all_sets.extend(sets)
-                print(f"系列 {series}: 找到 {len(sets)} 个集合")
-
-            if not all_sets:
-                print("没有找到任何卡牌集合")
-                return
+        )
 
-            print(f"\n总共 {len(all_sets)} 个集合待处理")
-            print()
-
-            # 计算总任务数
-            # 对于探测模式（卡牌数为0的集合），预估每个语言50张
-            PROBE_ESTIMATE = 50
-            total_tasks = 0
-            for card_set in all_sets:
-                total_cards = card_set.set_n_cards + card_set.set_n_secrets
-                if total_cards == 0:
-                    # 探测模式：使用预估数量
-                    total_cards = PROBE_ESTIMATE
-                total_tasks += total_cards * len(self.languages)
-
-            self.stats["total"] = total_tasks
-            print(f"预计需要处理 {total_tasks} 张图片（探测模式按预估计算）")
-            print()
-
-            # 创建进度条
-            with tqdm(total=total_tasks, desc="下载进度", unit="img") as pbar:
-                # 处理每个集合
-                tasks = []
-                for card_set in all_sets:
-                    task = self.process_set(session, card_set, pbar)
-                    tasks.append(task)
-
-                # 并发处理所有集合
-                await asyncio.gather(*tasks, return_exceptions=True)
+    async def __aenter__(self) -> "PTCGPDownloader":
+        if self.session is None:
+            self.session = self.create_session()
+            self._owns_session = True
+        return self
 
-        # 输出统计
-        print("\n" + "=" * 50)
-        print("下载完成!")
-        print(f"  主源下载: {self.stats['downloaded']}")
-        print(f"  备选源下载: {self.stats.get('downloaded_fallback', 0)}")
-        print(f"  已存在跳过: {self.stats['skipped']}")
-        print(f"  失败: {self.stats['failed']}")
-        print(f"  总计: {self.stats['total']}")
-        print("=" * 50)
+    async def __aexit__(self, *exc_info):
+        if self._owns_session and self.session is not None:
+            await self.session.close()
+            self.session = None
+            self._owns_session = False
 
-        # 输出缺失的 URL（404），按 set 分组
-        if self.missing_items:
-            print(f"\n缺失的链接 (404) ({len(self.missing_items)} 个):")
+    async def run(self):
+        """运行下载器
 
-            # 按 set_code 分组
-            from collections import defaultdict
+        未注入会话时，在本次运行期间临时创建并关闭会话；
+        在 ``async with downloader:`` 中多次调用则复用同一会话和连接池。
+        """
+        if self.session is None:
+            async with self:
+                await self.run()
+            return
+
+        self.reset_stats()
 
-            grouped = defaultdict(list)
-            for set_code, url in self.missing_items:
-                grouped[set_code].append(url)
+        print(f"开始下载 PTCGP 卡牌图片...")
+        print(f"目标目录: {self.base_dir}")
+        print(f"语言: {', '.join(self.languages)}")
+        print(f"系列: {', '.join(self.series_list)}")
+        print(f"并发数: {self.max_concurrency} (单主机连接上限: {self.per_host_limit})")
+        print()
 
-            # 按 set_code 排序输出
-            for set_code in sorted(grouped.keys()):
-                print(f"\n  [{set_code}] ({len(grouped[set_code])} 个):")
-                for url in grouped[set_code]:
-                    print(f"    - {url}")
+        session = self.session
+
+        # 并发获取所有系列的集合（fetch_sets 内部处理异常，失败时返回空列表）
+        async with asyncio.TaskGroup() as tg:
+            fetches = [
+                tg.create_task(self.fetch_sets(session, series))
+                for series in self.series_list
+            ]
+        all_sets: List[CardSet] = []
+        # 同时累计总任务数；探测模式（卡牌数为0）的集合计为0，探测完成后再计入
+        total_tasks = 0
+        for series, fetch in zip(self.series_list, fetches):
+            sets = fetch.result()
+            all_sets.extend(sets)
+            total_tasks += sum(
+                card_set.set_n_cards + card_set.set_n_secrets for card_set in sets
+            ) * len(self.languages)
+            print(f"系列 {series}: 找到 {len(sets)} 个集合")
+
+        if not all_sets:
+            print("没有找到任何卡牌集合")
+            return
+
+        self.load_caches()
+
+        print(f"\n总共 {len(all_sets)} 个集合待处理")
+        print()
 
-        # 输出备选源下载成功的 URL，按 set 分组
-        if self.fallback_items:
-            print(f"\n备选源下载成功 ({len(self.fallback_items)} 个):")
+        self.total = total_tasks
+        print(f"预计需要处理 {total_tasks} 张图片（探测模式的集合在探测完成后计入）")
+        print()
 
-            # 按 set_code 分组
-            from collections import defaultdict
+        # 创建进度条和写入线程池，退出时等待已提交的写入完成后关闭线程池
+        with (
+            ThreadPoolExecutor(
+                max_workers=self.IO_WORKERS, thread_name_prefix="dl-write"
+            ) as self._io_pool,
+            tqdm(total=total_tasks, desc="下载进度", unit="img") as pbar,
+        ):
+            # 完成数只在内存中累计，由后台任务定时刷新到进度条
+            flusher = asyncio.create_task(self.flush_pbar_periodically(pbar))
+            try:
+                # 固定数量的 worker 消费有界队列，worker 数即并发上限；
+                # 入队出错时 TaskGroup 会取消所有 worker，不会遗留后台任务
+                queue: asyncio.Queue = asyncio.Queue(maxsize=self.max_concurrency * 4)
+                async with asyncio.TaskGroup() as tg:
+                    for _ in range(self.max_concurrency):
+                        tg.create_task(self.worker(session, queue, pbar))
+
+                    await self.produce(session, queue, all_sets, pbar)
+
+                    for _ in range(self.max_concurrency):
+                        await queue.put(None)
+            finally:
+                flusher.cancel()
+                self.flush_pbar(pbar)
+                self._io_pool = None
+                # 中断或出错时也写回已记录的 404 和清单
+                self.save_caches()
 
-            grouped = defaultdict(list)
-            for set_code, number, lang, url in self.fallback_items:
-                grouped[set_code].append((number, lang, url))
+        # 输出统计
+        print("\n" + "=" * 50)
+        print("下载完成!")
+        print(f"  主源下载: {self.downloaded}")
+        print(f"  备选源下载: {self.downloaded_fallback}")
+        print(f"  已存在跳过: {self.skipped}")
+        print(f"  失败: {self.failed}")
+        print(f"  总计: {self.total}")
+        print("=" * 50)
 
-            # 按 set_code 排序输出
-            for set_code in sorted(grouped.keys()):
-                print(f"\n  [{set_code}] ({len(grouped[set_code])} 个):")
-                for number, lang, url in sorted(grouped[set_code]):
-                    print(f"    - #{number} [{lang}]: {url}")
+        self.print_grouped("缺失的链接 (404)", self.missing_items)
 
-        # 输出失败的 URL，按 set 分组
-        if self.failed_items:
-            print(f"\n失败的链接 ({len(self.failed_items)} 个):")
+        for items in self.fallback_items.values():
+            items.sort()
+        self.print_grouped(
+            "备选源下载成功",
+            self.fallback_items,
+            lambda item: f"#{item[0]} [{item[1]}]: {item[2]}",
+        )
 
-            # 按 set_code 分组
-            from collections import defaultdict
+        self.print_grouped("失败的链接", self.failed_items)
 
-            grouped = defaultdict(list)
-            for set_code, url in self.failed_items:
-                grouped[set_code].append(url)
+    @staticmethod
+    def print_grouped(
+        title: str,
+        grouped: Dict[str, List[Any]],
+        format_item: Callable[[Any], str] = str,
+    ):
+        """按 set_code 排序输出已分组的链接"""
+        total = sum(len(items) for items in grouped.values())
+        if not total:
+            return
 
-            # 按 set_code 排序输出
-            for set_code in sorted(grouped.keys()):
-                print(f"\n  [{set_code}] ({len(grouped[set_code])} 个):")
-                for url in grouped[set_code]:
-                    print(f"    - {url}")
+        print(f"\n{title} ({total} 个):")
+        for set_code, items in sorted(grouped.items()):
+            print(f"\n  [{set_code}] ({len(items)} 个):")
+            for item in items:
+                print(f"    - {format_item(item)}")
 
 
 def main():
@@ -562,14 +1066,27 @@ def main():
         default=20,
         help="并发下载数 (默认: 20)",
     )
+    parser.add_argument(
+        "--per-host-limit",
+        type=int,
+        default=None,
+        help="单个主机的最大连接数，0 表示不限制 (默认: 与并发数相同)",
+    )
     parser.add_argument(
         "--max-retries",
         type=int,
         default=3,
         help="单文件最大重试次数 (默认: 3)",
     )
+    parser.add_argument(
+        "--refresh",
+        action="store_true",
+        help="重新检查已存在的图片，使用 ETag 条件请求，未变化的不会重新下载",
+    )
 
     args = parser.parse_args()
+    if args.per_host_limit is not None and args.per_host_limit < 0:
+        parser.error("--per-host-limit 不能为负数")
 
     # 解析参数
     base_dir = Path(args.base_dir).resolve()
@@ -583,10 +1100,20 @@ def main():
         series_list=series_list,
         max_concurrency=args.concurrency,
         max_retries=args.max_retries,
+        refresh=args.refresh,
+        per_host_limit=args.per_host_limit,
     )
 
+    # 安装了 uvloop 时使用更快的事件循环（只作用于本次运行，不修改全局策略）
+    try:
+        import uvloop
+    except ImportError:
+        loop_factory = None
+    else:
+        loop_factory = uvloop.new_event_loop
+
     try:
-        asyncio.run(downloader.run())
+        asyncio.run(downloader.run(), loop_factory=loop_factory)
     except KeyboardInterrupt:
         print("\n\n用户中断，正在退出...")
         sys.exit(1)